@@ -7,39 +7,83 @@ My Transcoder system, combined with TMDb poster fetcher designed by RakaMaru (ht
 
 Key behaviors:
  - Prompts each run for Downloads and Output unless --downloads/--output provided.
- - Default: run until stopped (polling).
+ - Default: run until stopped (watches Downloads for filesystem events; polls on NFS/CIFS).
  - Supports per-file confirm mode (--confirm), posters-only (--posters-only),
    disable posters (--no-posters), dry-run, reset DB, and one-shot (--one-shot).
  - Posters-only saves posters next to top-level folders in the start location (Downloads root).
 
 Requirements:
  - HandBrakeCLI (handbrake-cli) and ffprobe (ffmpeg) on PATH
- - Python deps: pillow, requests
+ - Python deps: pillow, requests, watchfiles>=0.21
  - TMDB API key
 """
-import os, sys, time, json, shutil, sqlite3, subprocess
+import os, re, sys, time, json, errno, queue, shutil, sqlite3, subprocess, threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from itertools import chain
 from pathlib import Path
 from argparse import ArgumentParser
-from typing import Optional, Dict, Any, List, Set
+from typing import Optional, Dict, Any, Iterable, List, NamedTuple, Set, Tuple
 
 # ---------- CONFIG ----------
 DB_PATH = Path.home() / ".nomad_transcoder_state.db"
 TEMP_SUFFIX = ".transcoding"
-VIDEO_EXTS = {".mp4", ".mkv", ".avi", ".m4v", ".ts", ".flv", ".mov"}
+VIDEO_EXTS = frozenset({".mp4", ".mkv", ".avi", ".m4v", ".ts", ".flv", ".mov"})
+VIDEO_EXTS_NOSUFFIX = frozenset(e[1:] for e in VIDEO_EXTS)
 TEMP_PATTERNS = [".part", ".crdownload", ".!qB", ".partial", ".downloading"]
+# one search instead of a Python loop per pattern; case-sensitive and anchored to the
+# end of the name, so scene names like "Movie.Part.1.2010.mkv" are not swallowed
+_TEMP_RE = re.compile(r"\.(%s)$" % "|".join(re.escape(p[1:]) for p in TEMP_PATTERNS))
 SIZE_STABLE_SECONDS = 30
 DEFAULT_POLL_INTERVAL = 20
+WATCH_DEBOUNCE_SECONDS = 2
+HOUSEKEEPING_INTERVAL = 10
+NETWORK_FS_TYPES = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p"}
 HANDBRAKE_PRESET = "Fast 480p30"
+HB_PROGRESS_RE = re.compile(r"Encoding: task \d+ of \d+, (\d+(?:\.\d+)?) %")
+HANDBRAKE_STALL_SECONDS = 120
+PROGRESS_MARK_SECONDS = 30
+# name tags; letter/digit lookarounds instead of \b so "_480p_" matches too
+_TAG = r"(?i)(?<![a-z0-9])(%s)(?![a-z0-9])"
+LOW_RES_RE = re.compile(_TAG % "480p|360p")
+SMALL_CODEC_RE = re.compile(_TAG % "x264|h264|avc")
+HIGH_RES_RE = re.compile(_TAG % "540p|576p|720p|1080p|1080i|1440p|2160p|4k|uhd")
+MARK_BATCH_SIZE = 200
+MAINTENANCE_INTERVAL = 86400
+MAINTENANCE_MARKS = 10000
+MAINTENANCE_CHECK_SECONDS = 600
+COPY_BUFSIZE = 1 << 20
+SENDFILE_MAX = 0x7ffff000  # Linux caps a single sendfile() at this many bytes
+TERMINAL_STATES = frozenset({"done_moved","skipped_moved","kept_original_moved","copied_season"})
+DONE_STATUSES = TERMINAL_STATES | {"processing"}
+# only these keep a notes row (plus "processing" for the HandBrake progress %)
+NOTED_STATES = frozenset({"error", "skipped_by_user", "skipped_moved", "processing"})
 
 DEFAULT_DOWNLOADS = str(Path.home() / "Transcoding System" / "Input - Downloads")
 DEFAULT_OUTPUT = str(Path.home() / "Transcoding System" / "Output")
 
 TMDB_BASE = "https://api.themoviedb.org/3"
 TMDB_IMG_BASE = "https://image.tmdb.org/t/p"
+TMDB_CACHE_PATH = Path.home() / ".nomad_tmdb_cache.db"
+TMDB_RATE_LIMIT = 35  # requests per TMDB_RATE_WINDOW seconds (under the historic 40/10s cap)
+TMDB_RATE_WINDOW = 10
+POSTER_CACHE_TTL = 30 * 86400
+POSTER_MISS_TTL = 86400
+POSTER_WAIT_SECONDS = 60
 
 # ---------- GLOBAL ARGS (populated later) ----------
 ARGS = None
 
+# HandBrake is CPU-heavy: one encode at a time no matter how many probes run
+HANDBRAKE_SLOTS = threading.Semaphore(1)
+# ffprobe is mostly subprocess wall time: shared pool, results keyed by path
+PROBE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="probe")
+_probe_futures: Dict[str, Future] = {}
+# posters are pure network IO: fetched alongside probing/encoding
+POSTER_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="poster")
+# (source st_dev, dest dir) -> same filesystem? so move_safe stats each dest dir once
+_same_fs: Dict[Tuple[int, str], bool] = {}
+
 # ---------- UTIL ----------
 def log(msg: str):
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
@@ -61,19 +105,123 @@ def unique_dest(dest: Path) -> Path:
         i += 1
 
 def is_temporary_name(name: str) -> bool:
-    for p in TEMP_PATTERNS:
-        if name.endswith(p) or p in name:
-            return True
-    return False
+    return bool(_TEMP_RE.search(name))
+
+def is_video_name(name: str) -> bool:
+    # same answer as Path(name).suffix.lower() in VIDEO_EXTS without building a Path
+    head, _, ext = name.rpartition(".")
+    return bool(head) and ext.lower() in VIDEO_EXTS_NOSUFFIX
 
 # ---------- DB ----------
+# files stays narrow (the hot per-path lookups); notes and probe results live in side tables
+FILES_DDL = """CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY COLLATE BINARY, status TEXT, added_at INTEGER, updated_at INTEGER)"""
+NOTES_DDL = """CREATE TABLE IF NOT EXISTS notes (path TEXT PRIMARY KEY COLLATE BINARY, note TEXT)"""
+PROBES_DDL = """CREATE TABLE IF NOT EXISTS probes (path TEXT PRIMARY KEY COLLATE BINARY, probe_json TEXT)"""
+MARK_SQL = """INSERT INTO files(path,status,added_at,updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT(path) DO UPDATE SET status=excluded.status, updated_at=excluded.updated_at"""
+NOTE_SQL = """INSERT INTO notes(path,note) VALUES (?, ?) ON CONFLICT(path) DO UPDATE SET note=excluded.note"""
+PROBE_GET_SQL = "SELECT probe_json FROM probes WHERE path=?"
+PROBE_SET_SQL = """INSERT INTO probes(path,probe_json) VALUES (?, ?) ON CONFLICT(path) DO UPDATE SET probe_json=excluded.probe_json"""
+
+class StateDB(sqlite3.Connection):
+    """Connection with a little bookkeeping for batched writes, reused cursors and a status cache."""
+    pending_marks = 0
+    total_marks = 0  # read by the maintenance thread
+    mark_stmt = None
+    note_stmt = None
+    status_cache = None  # path -> status, loaded in init_db()
+
+def migrate_db(cur):
+    # older DBs kept note/probe_json inline on files; split them out once
+    cols = {r[1] for r in cur.execute("PRAGMA table_info(files)")}
+    if not cols & {"note", "probe_json"}: return
+    cur.execute("BEGIN IMMEDIATE")
+    cur.execute("ALTER TABLE files RENAME TO files_old")
+    cur.execute(FILES_DDL)
+    cur.execute("INSERT INTO files SELECT path, status, added_at, updated_at FROM files_old WHERE status IS NOT NULL")
+    if "note" in cols:
+        cur.execute("INSERT OR REPLACE INTO notes SELECT path, note FROM files_old WHERE note IS NOT NULL")
+    if "probe_json" in cols:
+        cur.execute("INSERT OR REPLACE INTO probes SELECT path, probe_json FROM files_old WHERE probe_json IS NOT NULL")
+    cur.execute("DROP TABLE files_old")
+    cur.execute("COMMIT")
+    log("Migrated state DB: notes/probes moved to side tables.")
+
 def init_db():
-    con = sqlite3.connect(DB_PATH)
+    # autocommit mode; write batches are grouped explicitly with DBWriter
+    con = sqlite3.connect(DB_PATH, factory=StateDB, isolation_level=None, cached_statements=256)
     cur = con.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, status TEXT, added_at INTEGER, updated_at INTEGER, note TEXT)""")
-    con.commit()
+    if cur.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        # incremental mode only takes effect after a full VACUUM
+        cur.execute("PRAGMA auto_vacuum=INCREMENTAL"); cur.execute("VACUUM")
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA cache_size=-20000")
+    cur.execute(NOTES_DDL); cur.execute(PROBES_DDL)
+    migrate_db(cur)
+    cur.execute(FILES_DDL)
+    # a "processing" row left by a crash mid-encode would otherwise never be retried
+    cur.execute("INSERT OR REPLACE INTO notes SELECT path, 'interrupted' FROM files WHERE status='processing'")
+    cur.execute("UPDATE files SET status='queued' WHERE status='processing'")
+    # same SQL text every call -> statement cache hit, no re-parse
+    con.mark_stmt = con.cursor()
+    con.note_stmt = con.cursor()
+    # status_of() is served from memory; mark() keeps it in step with the table
+    con.status_cache = {p: st for p, st in cur.execute("SELECT path, status FROM files WHERE status IS NOT NULL")}
     return con
 
+def _maintenance_loop(stop, con):
+    """
+    Background DB upkeep once a day or every MAINTENANCE_MARKS marks: drop probe
+    results for finished files and stale notes, give freed pages back, refresh
+    planner stats.
+    Own connection (con is only read for its mark counter); if a scan's write
+    batch holds the lock, try again next round.
+    """
+    last_run = time.time(); last_marks = 0
+    while not stop.wait(MAINTENANCE_CHECK_SECONDS):
+        marks = con.total_marks
+        if time.time() - last_run < MAINTENANCE_INTERVAL and marks - last_marks < MAINTENANCE_MARKS:
+            continue
+        try:
+            m = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+            try:
+                done = ",".join("?" * len(TERMINAL_STATES))
+                m.execute(f"DELETE FROM probes WHERE path IN (SELECT path FROM files WHERE status IN ({done}))", tuple(TERMINAL_STATES))
+                # notes left over from an error that was later retried successfully
+                noted = ",".join("?" * len(NOTED_STATES))
+                m.execute(f"DELETE FROM notes WHERE path NOT IN (SELECT path FROM files WHERE status IN ({noted}))", tuple(NOTED_STATES))
+                m.execute("PRAGMA incremental_vacuum").fetchall()
+                m.execute("PRAGMA optimize")
+            finally:
+                m.close()
+            last_run, last_marks = time.time(), marks
+        except sqlite3.Error as e:
+            log(f"DB maintenance skipped: {e}")
+
+class DBWriter:
+    """
+    Group marks into one transaction (one fsync) instead of one per row.
+    Nested use is a no-op so callers can wrap freely.
+    """
+    def __init__(self, con):
+        self.con = con
+        self.owner = False
+
+    def __enter__(self):
+        if not self.con.in_transaction:
+            self.con.execute("BEGIN IMMEDIATE")
+            self.con.pending_marks = 0
+            self.owner = True
+        return self.con
+
+    def __exit__(self, *exc):
+        # commit even on error: rows describe file moves that already happened
+        if self.owner and self.con.in_transaction:
+            self.con.execute("COMMIT")
+        return False
+
 def reset_db():
     try:
         DB_PATH.unlink()
@@ -83,30 +231,107 @@ def reset_db():
 
 def mark(con, path: Path, status: str, note: Optional[str]=None):
     ts = int(time.time())
-    cur = con.cursor()
-    cur.execute("""INSERT INTO files(path,status,added_at,updated_at,note) VALUES (?, ?, ?, ?, ?)
-                   ON CONFLICT(path) DO UPDATE SET status=excluded.status, updated_at=excluded.updated_at, note=excluded.note""",
-                (str(path), status, ts, ts, note))
-    con.commit()
+    key = str(path)
+    con.mark_stmt.execute(MARK_SQL, (key, status, ts, ts))
+    # notes are only kept where someone will look: errors, skips, encode progress;
+    # the cached previous status says whether an old note needs clearing
+    if note is not None and status in NOTED_STATES:
+        con.note_stmt.execute(NOTE_SQL, (key, note))
+    elif con.status_cache.get(key) in NOTED_STATES:
+        con.note_stmt.execute("DELETE FROM notes WHERE path=?", (key,))
+    con.status_cache[key] = status
+    con.total_marks += 1
+    if con.in_transaction:
+        # safety commit so a crash in a long batch loses at most MARK_BATCH_SIZE rows
+        con.pending_marks += 1
+        if con.pending_marks >= MARK_BATCH_SIZE:
+            checkpoint(con)
+
+def mark_many(con, rows: Iterable[Tuple[str, str, int, int, Optional[str]]]):
+    """Bulk mark: one prepared statement bound per row inside one transaction."""
+    notes: List[Tuple[str, str]] = []
+    written = 0
+    def tracked():
+        nonlocal written
+        for path, status, added_at, updated_at, note in rows:
+            con.status_cache[path] = status
+            if note is not None and status in NOTED_STATES: notes.append((path, note))
+            written += 1
+            yield (path, status, added_at, updated_at)
+    with DBWriter(con):
+        con.mark_stmt.executemany(MARK_SQL, tracked())
+        if notes: con.note_stmt.executemany(NOTE_SQL, notes)
+    con.total_marks += written
+
+def checkpoint(con):
+    # commit what the current batch has so far and keep the batch open
+    if con.in_transaction:
+        con.execute("COMMIT"); con.execute("BEGIN IMMEDIATE")
+        con.pending_marks = 0
 
 def status_of(con, path: Path) -> Optional[str]:
-    cur = con.cursor()
-    cur.execute("SELECT status FROM files WHERE path=?", (str(path),))
-    r = cur.fetchone()
-    return r[0] if r else None
+    return con.status_cache.get(str(path))
+
+def cached_probe(con, path: Path) -> Optional[Dict[str,Any]]:
+    # only trusted while the file still has the size ffprobe saw
+    r = con.execute(PROBE_GET_SQL, (str(path),)).fetchone()
+    if not r or not r[0]: return None
+    try:
+        info = json.loads(r[0])
+        return info if info.get("size") == path.stat().st_size else None
+    except Exception:
+        return None
+
+def save_probe(con, path: Path, info: Dict[str,Any]):
+    con.execute(PROBE_SET_SQL, (str(path), json.dumps(info)))
 
 # ---------- probing & transcode ----------
+# path -> time of last watcher event / ((size, mtime_ns), time that signature was first seen)
+_last_event: Dict[str, float] = {}
+_file_sig: Dict[str, Tuple[Tuple[int, int], float]] = {}
+
+def note_change(path: str):
+    # only videos ever reach file_is_stable; recording temp files/sidecars/dirs would just leak
+    name = os.path.basename(path)
+    if is_video_name(name) and not is_temporary_name(name):
+        _last_event[path] = time.time()
+
+def forget_file(path: str):
+    _last_event.pop(path, None); _file_sig.pop(path, None); _probe_futures.pop(path, None)
+
+def forget_under(top: Path):
+    # an entry vanished (e.g. deleted while deferred): drop its per-file state
+    prefix = str(top) + os.sep
+    for d in (_last_event, _file_sig, _probe_futures):
+        for k in [k for k in d if k.startswith(prefix) or k == str(top)]:
+            del d[k]
+
 def file_is_stable(p: Path, wait: int = SIZE_STABLE_SECONDS) -> bool:
+    """
+    Non-blocking quiescence check: stable once neither a watcher event nor a
+    size/mtime change has been seen for `wait` seconds.
+    """
+    key = str(p)
     try:
-        s1 = p.stat().st_size
-    except FileNotFoundError:
-        return False
-    time.sleep(wait)
-    try:
-        s2 = p.stat().st_size
+        st = p.stat()
     except FileNotFoundError:
+        forget_file(key)
         return False
-    return s1 == s2 and s1 > 0
+    now = time.time()
+    sig = (st.st_size, st.st_mtime_ns)
+    prev = _file_sig.get(key)
+    if prev is None:
+        changed_at = st.st_mtime  # first look: trust the file's own mtime
+    elif prev[0] != sig:
+        changed_at = now
+    else:
+        changed_at = prev[1]
+    changed_at = max(changed_at, _last_event.get(key, 0.0))
+    if st.st_size > 0 and now - changed_at >= wait:
+        _last_event.pop(key, None); _file_sig.pop(key, None)
+        return True
+    _file_sig[key] = (sig, changed_at)
+    return False
 
 def probe_video(path: Path) -> Optional[Dict[str,Any]]:
     cmd = ["ffprobe","-v","error","-select_streams","v:0","-show_entries","stream=codec_name,width,height,bit_rate","-show_entries","format=format_name,duration,size","-of","json", str(path)]
@@ -120,42 +345,187 @@ def probe_video(path: Path) -> Optional[Dict[str,Any]]:
     except Exception:
         return None
 
+def prefetch_probes(con, videos) -> Dict[Future, Path]:
+    """Queue ffprobe on PROBE_POOL for videos that will need one; returns their futures."""
+    out = {}
+    for vid in videos:
+        fut = _probe_futures.get(str(vid))
+        if fut is None:
+            if (status_of(con, vid) in DONE_STATUSES or is_temporary_name(vid.name)
+                    or _cheap_skip(vid.name) or cached_probe(con, vid)):
+                continue
+            fut = _probe_futures[str(vid)] = PROBE_POOL.submit(probe_video, vid)
+        out[fut] = vid
+    return out
+
+def take_probe(con, src: Path) -> Optional[Dict[str,Any]]:
+    # prefetched result if it still matches the file, else DB cache, else probe now
+    fut = _probe_futures.pop(str(src), None)
+    info = cached_probe(con, src)
+    if info is None and fut is not None:
+        info = fut.result()
+        try:
+            if info and info.get("size") != src.stat().st_size: info = None
+        except OSError:
+            info = None
+        if info: save_probe(con, src, info)
+    if info is None:
+        info = probe_video(src)
+        if info: save_probe(con, src, info)
+    return info
+
+def _cheap_skip(name: str) -> bool:
+    # filename already says <=480p h264 mp4: no need to fork ffprobe; anything else gets probed
+    return (name.lower().endswith(".mp4") and bool(LOW_RES_RE.search(name))
+            and bool(SMALL_CODEC_RE.search(name)) and not HIGH_RES_RE.search(name))
+
 def should_skip_by_probe(info: Optional[Dict[str,Any]]) -> bool:
     if not info: return False
     fmt = (info.get("format_name") or "").lower(); v = (info.get("vcodec") or "").lower(); w = info.get("width") or 0
     return ("mp4" in fmt) and (v in ("h264","avc1")) and (w <= 854)
 
-def transcode_with_handbrake(src: Path, dest_tmp: Path) -> int:
+def low_priority_prefix() -> List[str]:
+    # keep transcodes from starving the watcher and the rest of the box
+    pre = []
+    if shutil.which("nice"): pre += ["nice","-n","10"]
+    if shutil.which("ionice"): pre += ["ionice","-c3"]
+    return pre
+
+def run_supervised(cmd: List[str], on_progress) -> int:
+    """
+    Run HandBrake with its output on a pipe, reporting percent complete and
+    killing it if no progress line arrives for HANDBRAKE_STALL_SECONDS.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, errors="replace")
+    lines: queue.Queue = queue.Queue()
+    def pump():
+        # text mode splits on HandBrake's \r progress updates too
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+    threading.Thread(target=pump, daemon=True).start()
+    last_progress = time.monotonic()
+    while True:
+        try:
+            line = lines.get(timeout=5)
+        except queue.Empty:
+            if time.monotonic() - last_progress > HANDBRAKE_STALL_SECONDS:
+                log(f"HandBrake made no progress for {HANDBRAKE_STALL_SECONDS}s; terminating.")
+                proc.terminate()
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                return proc.wait()
+            continue
+        if line is None: break
+        m = HB_PROGRESS_RE.search(line)
+        if m:
+            last_progress = time.monotonic()
+            on_progress(float(m.group(1)))
+    return proc.wait()
+
+def transcode_with_handbrake(src: Path, dest_tmp: Path, con=None) -> int:
     cmd = ["HandBrakeCLI","-i",str(src),"-o",str(dest_tmp),"--preset", HANDBRAKE_PRESET, "-O"]
-    if ARGS.dry_run:
-        log(f"[DRY-RUN] Would run: {' '.join(cmd)}")
-        return 0
-    log(f"HandBrakeCLI -> {src.name}")
-    return run_cmd(cmd).returncode
+    state = {"logged": -10, "marked": 0.0}
+    def on_progress(pct: float):
+        if pct - state["logged"] >= 10:
+            state["logged"] = int(pct // 10) * 10
+            log(f"HandBrakeCLI {src.name}: {pct:.0f}%")
+        now = time.monotonic()
+        if con is not None and now - state["marked"] >= PROGRESS_MARK_SECONDS:
+            state["marked"] = now
+            mark(con, src, "processing", f"{pct:.0f}%")
+            checkpoint(con)
+    with HANDBRAKE_SLOTS:
+        log(f"HandBrakeCLI -> {src.name}")
+        return run_supervised(low_priority_prefix() + cmd, on_progress)
 
 def move_safe(src: Path, dest_dir: Path) -> Path:
     ensure_dir(dest_dir)
     dest = dest_dir / src.name
     dest = unique_dest(dest)
-    if ARGS.dry_run:
-        log(f"[DRY-RUN] Would move {src} -> {dest}")
-        return dest
-    try:
-        src.rename(dest)
-    except Exception:
-        shutil.copy2(src, dest)
+    st = os.stat(src)
+    key = (st.st_dev, str(dest_dir))
+    same_fs = _same_fs.get(key)
+    if same_fs is None:
+        same_fs = _same_fs[key] = os.stat(dest_dir).st_dev == st.st_dev
+    if same_fs:
         try:
-            src.unlink()
-        except Exception:
-            pass
+            os.replace(src, dest)
+            return dest
+        except OSError as e:
+            # only a cross-device refusal falls through to copying; anything else is real
+            if e.errno != errno.EXDEV: raise
+            _same_fs[key] = False
+    try:
+        copy_file_fast(str(src), str(dest), st.st_size)
+        shutil.copystat(src, dest)
+    except BaseException:
+        try: dest.unlink()
+        except OSError: pass
+        raise
+    try:
+        src.unlink()
+    except OSError:
+        pass
     return dest
 
-def copy_tree_safe(src_dir: Path, dest_dir: Path):
+def copy_file_fast(src: str, dst: str, size: int):
+    with open(src, "rb") as fi, open(dst, "wb") as fo:
+        if sys.platform.startswith("linux"):
+            # zero-copy in kernel; fall back to buffered copy if the fs refuses
+            try:
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(fo.fileno(), fi.fileno(), offset, min(size - offset, SENDFILE_MAX))
+                    if sent == 0: break
+                    offset += sent
+                return
+            except OSError:
+                fi.seek(0); fo.seek(0); fo.truncate()
+        shutil.copyfileobj(fi, fo, COPY_BUFSIZE)
+
+def same_file_meta(a: os.stat_result, b: os.stat_result) -> bool:
+    # 2s slack for FAT/exFAT (SD cards) mtime granularity
+    return a.st_size == b.st_size and abs(a.st_mtime - b.st_mtime) < 2
+
+def copy_tree_safe(src_dir: Path, dest_dir: Path) -> List[Path]:
+    """
+    Mirror src_dir into dest_dir; returns the source files now present at dest
+    (copied, or already there with the same size+mtime) so callers need no rewalk.
+    """
     ensure_dir(dest_dir)
-    if ARGS.dry_run:
-        log(f"[DRY-RUN] Would copy tree {src_dir} -> {dest_dir}")
-        return
-    shutil.copytree(src_dir, dest_dir, dirs_exist_ok=True)
+    mirrored: List[Path] = []
+    # single scandir walk; files already at dest with same size+mtime are left alone
+    stack = [(str(src_dir), str(dest_dir))]
+    while stack:
+        s_dir, d_dir = stack.pop()
+        with os.scandir(s_dir) as it:
+            for e in it:
+                target = os.path.join(d_dir, e.name)
+                if e.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    stack.append((e.path, target))
+                    continue
+                if not e.is_file(): continue
+                st = e.stat()
+                mirrored.append(Path(e.path))
+                try:
+                    if same_file_meta(st, os.stat(target)): continue
+                except FileNotFoundError:
+                    pass
+                # copy beside the target then swap in atomically
+                tmp = target + TEMP_SUFFIX
+                try:
+                    copy_file_fast(e.path, tmp, st.st_size)
+                    shutil.copystat(e.path, tmp)
+                    os.replace(tmp, target)
+                except BaseException:
+                    try: os.unlink(tmp)
+                    except OSError: pass
+                    raise
+    return mirrored
 
 # ---------- TMDb poster ----------
 def load_tmdb_key(script_dir: Path) -> Optional[str]:
@@ -166,18 +536,111 @@ def load_tmdb_key(script_dir: Path) -> Optional[str]:
     except Exception:
         return None
 
+class RateLimiter:
+    """Sliding window: at most `rate` calls per `per` seconds, shared across threads."""
+    def __init__(self, rate: int, per: float):
+        self.rate = rate; self.per = per
+        self.lock = threading.Lock()
+        self.stamps: deque = deque()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            while self.stamps and now - self.stamps[0] >= self.per:
+                self.stamps.popleft()
+            if len(self.stamps) >= self.rate:
+                time.sleep(self.per - (now - self.stamps[0]))
+                self.stamps.popleft()
+            self.stamps.append(time.monotonic())
+
+TMDB_LIMITER = RateLimiter(TMDB_RATE_LIMIT, TMDB_RATE_WINDOW)
+_tmdb_session = None
+_tmdb_cache = None
+_tmdb_lock = threading.Lock()
+
+def tmdb_session():
+    # one pooled session: connections and TLS state are reused across shows
+    global _tmdb_session
+    with _tmdb_lock:
+        if _tmdb_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            s = requests.Session()
+            s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
+            _tmdb_session = s
+        return _tmdb_session
+
+def tmdb_cache_db():
+    # separate file from the state DB so lookups never wait on a scan's write transaction
+    global _tmdb_cache
+    if _tmdb_cache is None:
+        c = sqlite3.connect(TMDB_CACHE_PATH, check_same_thread=False, isolation_level=None)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("""CREATE TABLE IF NOT EXISTS posters (show TEXT PRIMARY KEY, poster_path TEXT, fetched_at INTEGER)""")
+        _tmdb_cache = c
+    return _tmdb_cache
+
+def normalize_show_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
 def tmdb_search_tv(api_key: str, title: str, lang: str="en-US"):
-    import requests
     params = {"api_key": api_key, "query": title, "language": lang, "include_adult":"false"}
-    r = requests.get(f"{TMDB_BASE}/search/tv", params=params, timeout=20); r.raise_for_status()
+    TMDB_LIMITER.wait()
+    r = tmdb_session().get(f"{TMDB_BASE}/search/tv", params=params, timeout=20); r.raise_for_status()
     data = r.json(); results = data.get("results") or []
     return results[0] if results else None
 
-def tmdb_fetch_poster_bytes(api_key: str, poster_path: str):
-    import requests
+def tmdb_poster_path(api_key: str, show: str) -> Optional[str]:
+    """
+    poster_path for a normalized show name: on-disk cache, else TMDb search.
+    Misses are cached too, but expire sooner than hits; the table is the only
+    cache so both TTLs also hold in a long-running watcher.
+    """
+    now = int(time.time())
+    with _tmdb_lock:
+        row = tmdb_cache_db().execute("SELECT poster_path, fetched_at FROM posters WHERE show=?", (show,)).fetchone()
+    if row:
+        ttl = POSTER_CACHE_TTL if row[0] else POSTER_MISS_TTL
+        if now - row[1] < ttl:
+            return row[0]
+    found = tmdb_search_tv(api_key, show)
+    poster_path = found.get("poster_path") if found else None
+    with _tmdb_lock:
+        tmdb_cache_db().execute("""INSERT INTO posters(show,poster_path,fetched_at) VALUES (?, ?, ?)
+                                   ON CONFLICT(show) DO UPDATE SET poster_path=excluded.poster_path, fetched_at=excluded.fetched_at""",
+                                (show, poster_path, now))
+    return poster_path
+
+def tmdb_fetch_poster(api_key: str, poster_path: str, dest: Path) -> bool:
+    """
+    Stream the poster straight into dest in COPY_BUFSIZE chunks. A dest that
+    already has the server's Content-Length is left alone (HEAD only); a HEAD
+    that fails just means "unknown" and falls through to the download.
+    """
     url = f"{TMDB_IMG_BASE}/original{poster_path}"
-    r = requests.get(url, timeout=30)
-    return r.content if r.status_code == 200 else None
+    session = tmdb_session()
+    if dest.exists():
+        TMDB_LIMITER.wait()
+        try:
+            h = session.head(url, timeout=20, allow_redirects=True)
+            if h.status_code == 200 and h.headers.get("Content-Length") == str(dest.stat().st_size):
+                return True
+        except Exception:
+            pass
+    TMDB_LIMITER.wait()
+    with session.get(url, stream=True, timeout=30) as r:
+        if r.status_code != 200: return False
+        r.raw.decode_content = True
+        ensure_dir(dest.parent)
+        tmp = dest.with_name(dest.name + TEMP_SUFFIX)
+        try:
+            with open(tmp, "wb") as fh:
+                shutil.copyfileobj(r.raw, fh, COPY_BUFSIZE)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+    return True
 
 def fetch_and_save_show_poster(show_name: str, out_root: Path, api_key: Optional[str], downloads_root: Path, posters_only: bool=False) -> bool:
     """
@@ -188,14 +651,10 @@ def fetch_and_save_show_poster(show_name: str, out_root: Path, api_key: Optional
         log(f"TMDb key not found; skipping poster for '{show_name}'")
         return False
     try:
-        found = tmdb_search_tv(api_key, show_name)
-        if not found or not found.get("poster_path"):
+        poster_path = tmdb_poster_path(api_key, normalize_show_name(show_name))
+        if not poster_path:
             log(f"No TMDb match for '{show_name}'")
             return False
-        poster = tmdb_fetch_poster_bytes(api_key, found["poster_path"])
-        if not poster:
-            log(f"No poster bytes for '{show_name}'")
-            return False
         if posters_only:
             dest = downloads_root / f"{show_name}.jpg"
         else:
@@ -203,9 +662,9 @@ def fetch_and_save_show_poster(show_name: str, out_root: Path, api_key: Optional
         if ARGS.dry_run:
             log(f"[DRY-RUN] Would write poster {dest}")
             return True
-        ensure_dir(dest.parent)
-        with open(dest, "wb") as fh:
-            fh.write(poster)
+        if not tmdb_fetch_poster(api_key, poster_path, dest):
+            log(f"No poster bytes for '{show_name}'")
+            return False
         log(f"Saved poster for '{show_name}' -> {dest}")
         return True
     except Exception as e:
@@ -213,25 +672,58 @@ def fetch_and_save_show_poster(show_name: str, out_root: Path, api_key: Optional
         return False
 
 # ---------- multi-depth collector ----------
+def _entry_kind(e: os.DirEntry, follow_symlinks: bool=True) -> str:
+    # "video" / "dir" / ""; a broken or looping symlink just counts as neither
+    try:
+        if is_video_name(e.name) and e.is_file():
+            return "video"
+        if e.is_dir(follow_symlinks=follow_symlinks):
+            return "dir"
+    except OSError:
+        pass
+    return ""
+
 def collect_videos_two_depth(top: Path) -> Dict[str, List[Path]]:
+    # os.scandir: is_file()/is_dir() come from d_type, so no extra stat() per entry
     out = {}
-    direct = [p for p in top.iterdir() if p.is_file() and p.suffix.lower() in VIDEO_EXTS]
+    direct = []; subdirs = []
+    with os.scandir(top) as it:
+        for e in it:
+            kind = _entry_kind(e)
+            if kind == "video":
+                direct.append(Path(e.path))
+            elif kind == "dir":
+                subdirs.append(e)
     if direct: out[""] = direct
-    for d in [p for p in top.iterdir() if p.is_dir()]:
+    for d in subdirs:
         vids = []
-        # files directly in season dir
-        for f in d.iterdir():
-            if f.is_file() and f.suffix.lower() in VIDEO_EXTS:
-                vids.append(f)
-            elif f.is_dir():
-                for nested in f.rglob("*"):
-                    if nested.is_file() and nested.suffix.lower() in VIDEO_EXTS:
-                        vids.append(nested)
+        # files in season dir plus anything nested below it
+        stack = [d.path]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for e in it:
+                    # like rglob: never recurse through symlinked dirs (loops)
+                    kind = _entry_kind(e, follow_symlinks=False)
+                    if kind == "video":
+                        vids.append(Path(e.path))
+                    elif kind == "dir":
+                        stack.append(e.path)
         if vids:
             out[d.name] = vids
     return out
 
 # ---------- file processing ----------
+class ScanFlags(NamedTuple):
+    """The ARGS switches the per-entry code needs, bound once per run."""
+    posters_only: bool
+    confirm: bool
+    fetch_posters: bool
+    dry_run: bool
+
 def rel_output_path(downloads_root: Path, src: Path, output_root: Path) -> Path:
     rel = src.relative_to(downloads_root)
     dest = output_root / rel
@@ -239,34 +731,39 @@ def rel_output_path(downloads_root: Path, src: Path, output_root: Path) -> Path:
     return dest
 
 def ask_confirm(prompt: str) -> bool:
-    if ARGS.dry_run:
-        log(f"[DRY-RUN] would ask: {prompt} -> auto-YES")
-        return True
     while True:
         ans = input(f"{prompt} [y/N]: ").strip().lower()
         if ans in ("y","yes"): return True
         if ans in ("n","no",""): return False
 
-def process_movie_file(con, src: Path, downloads_root: Path, output_root: Path):
+def process_movie_file(con, src: Path, downloads_root: Path, output_root: Path, flags: ScanFlags):
     s = status_of(con, src)
-    if s in ("processing","done_moved","skipped_moved","kept_original_moved","copied_season"):
+    if s in DONE_STATUSES:
         return
     if is_temporary_name(src.name):
         log(f"Skipping temp file {src.name}")
         return
-    if ARGS.confirm and not ask_confirm(f"Process file: {src}?"):
-        mark(con, src, "skipped_by_user", "user skipped")
-        log(f"User skipped {src.name}")
-        return
+    dry_run = flags.dry_run
     log(f"Processing file: {src}")
+    # check before asking: a deferred file comes back later and would be asked about again
     if not file_is_stable(src):
         log(f"File not stable yet: {src}")
         return
-    info = probe_video(src)
-    if should_skip_by_probe(info):
+    if flags.confirm and not ask_confirm(f"Process file: {src}?"):
+        mark(con, src, "skipped_by_user", "user skipped")
+        log(f"User skipped {src.name}")
+        return
+    if _cheap_skip(src.name):
+        skip = True
+    else:
+        skip = should_skip_by_probe(take_probe(con, src))
+    if skip:
         # copy original to output root preserving relative path
         dest_dir = (output_root / src.relative_to(downloads_root)).parent
-        moved = move_safe(src, dest_dir)
+        try:
+            moved = move_safe(src, dest_dir)
+        except OSError as e:
+            mark(con, src, "error", f"move_failed:{e}"); log(f"Error moving original: {e}"); return
         mark(con, src, "skipped_moved", f"moved to {moved}")
         log(f"SKIPPED BY PROBE -> moved original to {moved}")
         return
@@ -274,7 +771,7 @@ def process_movie_file(con, src: Path, downloads_root: Path, output_root: Path):
     mark(con, src, "queued", "ready")
     dest_tmp = (output_root / src.relative_to(downloads_root)).with_suffix(".mp4" + TEMP_SUFFIX)
     ensure_dir(dest_tmp.parent)
-    rc = transcode_with_handbrake(src, dest_tmp)
+    rc = transcode_with_handbrake(src, dest_tmp, con)
     if rc != 0:
         mark(con, src, "error", f"handbrake_exit_{rc}")
         log(f"HandBrake failed for {src.name}")
@@ -292,11 +789,14 @@ def process_movie_file(con, src: Path, downloads_root: Path, output_root: Path):
         mark(con, src, "error", "stat_failed"); return
     if orig_size <= new_size:
         # remove transcode tmp, move original to output
-        if not ARGS.dry_run:
+        if not dry_run:
             try: dest_tmp.unlink()
             except: pass
         dest_dir = (output_root / src.relative_to(downloads_root)).parent
-        moved = move_safe(src, dest_dir)
+        try:
+            moved = move_safe(src, dest_dir)
+        except OSError as e:
+            mark(con, src, "error", f"move_failed:{e}"); log(f"Error moving original: {e}"); return
         mark(con, src, "kept_original_moved", f"moved original to {moved}")
         log(f"Kept ORIGINAL (smaller/equal) -> moved to {moved}")
         return
@@ -304,7 +804,7 @@ def process_movie_file(con, src: Path, downloads_root: Path, output_root: Path):
         dest_final = (output_root / src.relative_to(downloads_root)).with_suffix(".mp4")
         if dest_final.exists(): dest_final = unique_dest(dest_final)
         try:
-            if not ARGS.dry_run:
+            if not dry_run:
                 dest_tmp.rename(dest_final)
                 try: src.unlink()
                 except: pass
@@ -314,28 +814,31 @@ def process_movie_file(con, src: Path, downloads_root: Path, output_root: Path):
         except Exception as e:
             mark(con, src, "error", f"move_failed:{e}"); log(f"Error moving transcode: {e}"); return
 
-def process_show_topdir(con, topdir: Path, downloads_root: Path, output_root: Path, tmdb_key: Optional[str]):
+def process_show_topdir(con, topdir: Path, downloads_root: Path, output_root: Path, tmdb_key: Optional[str], flags: ScanFlags, mapping: Optional[Dict[str, List[Path]]]=None):
+    with DBWriter(con):
+        _process_show_topdir(con, topdir, downloads_root, output_root, tmdb_key, flags, mapping)
+
+def _process_show_topdir(con, topdir: Path, downloads_root: Path, output_root: Path, tmdb_key: Optional[str], flags: ScanFlags, mapping: Optional[Dict[str, List[Path]]]=None):
     log(f"Processing show topdir: {topdir}")
-    mapping = collect_videos_two_depth(topdir)
+    if mapping is None:
+        mapping = collect_videos_two_depth(topdir)
     if not mapping:
         log("No videos found inside; skipping.")
         return
+    # posters: save poster at output root next to show folder; network runs while we encode
+    poster = None
+    if flags.fetch_posters:
+        poster = POSTER_POOL.submit(fetch_and_save_show_poster, topdir.name, output_root, tmdb_key, downloads_root, posters_only=False)
     season_needs_copy: Set[str] = set()
-    # direct files
-    if "" in mapping:
-        for vid in mapping[""]:
-            process_movie_file(con, vid, downloads_root, output_root)
-            st = status_of(con, vid)
-            if st in ("skipped_moved","kept_original_moved"):
-                season_needs_copy.add("")  # topdir copy
-    # seasons
-    for season_name, videos in mapping.items():
-        if season_name == "": continue
-        for vid in videos:
-            process_movie_file(con, vid, downloads_root, output_root)
-            st = status_of(con, vid)
-            if st in ("skipped_moved","kept_original_moved"):
-                season_needs_copy.add(season_name)
+    season_of = {vid: season_name for season_name, videos in mapping.items() for vid in videos}
+    # files needing no probe first, then the rest in probe completion order
+    probes = prefetch_probes(con, season_of)
+    probing = set(probes.values())
+    ready = (v for v in season_of if v not in probing)
+    for vid in chain(ready, (probes[f] for f in as_completed(probes))):
+        process_movie_file(con, vid, downloads_root, output_root, flags)
+        if status_of(con, vid) in ("skipped_moved","kept_original_moved"):
+            season_needs_copy.add(season_of[vid])  # "" -> topdir copy
     # copy full seasons that were flagged
     for sk in list(season_needs_copy):
         if sk == "":
@@ -346,66 +849,212 @@ def process_show_topdir(con, topdir: Path, downloads_root: Path, output_root: Pa
             dest_dir = output_root / (topdir.relative_to(downloads_root) / sk)
         if src_dir.exists():
             log(f"Season-level copy: {src_dir} -> {dest_dir}")
-            copy_tree_safe(src_dir, dest_dir)
-            for f in src_dir.rglob("*"):
-                if f.is_file() and f.suffix.lower() in VIDEO_EXTS:
-                    mark(con, f, "copied_season", f"season copied to {dest_dir}")
-    # posters: save poster at output root next to show folder
-    if not ARGS.no_posters and not ARGS.posters_only:
-        out_root = output_root
-        fetch_and_save_show_poster(topdir.name, out_root, tmdb_key, downloads_root, posters_only=False)
+            copied = copy_tree_safe(src_dir, dest_dir)
+            ts = int(time.time()); note = f"season copied to {dest_dir}"
+            mark_many(con, ((str(f), "copied_season", ts, ts, note) for f in copied if is_video_name(f.name)))
+    if poster is not None:
+        try:
+            poster.result(timeout=POSTER_WAIT_SECONDS)
+        except FuturesTimeout:
+            log(f"Poster fetch for '{topdir.name}' still running after {POSTER_WAIT_SECONDS}s; not waiting.")
 
 # ---------- main scan loop ----------
+def process_entry(con, entry: Path, downloads: Path, output: Path, tmdb_key: Optional[str], flags: ScanFlags, mapping: Optional[Dict[str, List[Path]]]=None) -> bool:
+    """
+    Handle one top-level Downloads entry. Returns True when the entry should be
+    retried later (files still being written).
+    """
+    if entry.name.startswith("."): return False
+    # if posters-only mode: only fetch posters and skip transcode logic
+    if flags.posters_only:
+        # for top-level folders only
+        if entry.is_dir():
+            if flags.confirm and not ask_confirm(f"Fetch poster for {entry.name}?"): return False
+            fetch_and_save_show_poster(entry.name, output, tmdb_key, downloads_root=downloads, posters_only=True)
+        return False
+    # skip ignored temp entries
+    if is_temporary_name(entry.name): return False
+    if entry.is_dir():
+        if mapping is None:
+            mapping = collect_videos_two_depth(entry)
+        if not mapping: return False
+        # sample a file to check stability
+        sample = None
+        for k,v in mapping.items():
+            if v:
+                sample = v[0]; break
+        if sample and not file_is_stable(sample):
+            log(f"Topdir {entry.name} has unstable files; skipping this pass.")
+            return True
+        process_show_topdir(con, entry, downloads, output, tmdb_key, flags, mapping)
+        return has_unsettled(con, [v for vids in mapping.values() for v in vids])
+    elif entry.is_file():
+        if not is_video_name(entry.name): return False
+        process_movie_file(con, entry, downloads, output, flags)
+        return has_unsettled(con, [entry])
+    return False
+
+def has_unsettled(con, videos: List[Path]) -> bool:
+    # still present and never marked -> was not stable yet, needs another look
+    return any(v.exists() and status_of(con, v) is None and not is_temporary_name(v.name) for v in videos)
+
+def process_batch(con, entries: List[Path], downloads: Path, output: Path, tmdb_key: Optional[str], flags: ScanFlags) -> Set[str]:
+    """
+    Scanner stage first: collect every entry and queue its probes on PROBE_POOL,
+    so later entries are probed while earlier ones encode. Returns names to retry.
+    """
+    mappings: Dict[str, Dict[str, List[Path]]] = {}
+    if not flags.posters_only:
+        todo = []
+        is_temp = _TEMP_RE.search  # hoisted: this loop touches every top-level entry
+        for entry in entries:
+            name = entry.name
+            if name.startswith(".") or is_temp(name): continue
+            if entry.is_dir():
+                mapping = mappings[entry.name] = collect_videos_two_depth(entry)
+                prefetch_probes(con, [v for vids in mapping.values() for v in vids])
+            elif is_video_name(name):
+                prefetch_probes(con, [entry])
+            todo.append(entry)
+        entries = todo
+    retry: Set[str] = set()
+    with DBWriter(con):
+        for entry in entries:
+            if process_entry(con, entry, downloads, output, tmdb_key, flags, mappings.get(entry.name)):
+                retry.add(entry.name)
+    return retry
+
+def scan_once(con, downloads: Path, output: Path, tmdb_key: Optional[str], flags: ScanFlags) -> Set[str]:
+    """Full iterdir walk of the Downloads root; returns names of entries to retry."""
+    return process_batch(con, sorted(downloads.iterdir()), downloads, output, tmdb_key, flags)
+
+def needs_force_polling(p: Path) -> bool:
+    """NFS/CIFS and friends don't deliver inotify events; detect via /proc/mounts."""
+    try:
+        mounts = Path("/proc/mounts").read_text().splitlines()
+    except OSError:
+        return False
+    target = str(p.resolve()); best = ""; best_type = ""
+    for line in mounts:
+        parts = line.split()
+        if len(parts) < 3: continue
+        mnt = parts[1].replace("\\040", " ")
+        if (target == mnt or target.startswith(mnt.rstrip("/") + "/")) and len(mnt) >= len(best):
+            best, best_type = mnt, parts[2]
+    return best_type in NETWORK_FS_TYPES
+
+def _housekeeping_loop(stop, lock, deferred: Set[str], pending: Dict[str, float]):
+    # slow reconciliation: entries skipped as unstable get another pass
+    while not stop.wait(HOUSEKEEPING_INTERVAL):
+        with lock:
+            for name in deferred:
+                pending.setdefault(name, 0.0)
+            deferred.clear()
+
+def watch_and_process(con, downloads: Path, output: Path, poll_interval: int, tmdb_key: Optional[str], flags: ScanFlags, deferred: Set[str]):
+    from watchfiles import watch, Change
+    force_polling = needs_force_polling(downloads)
+    if force_polling:
+        log(f"{downloads} is on a network filesystem; using polling every {poll_interval}s.")
+    stop = threading.Event(); lock = threading.Lock()
+    pending: Dict[str, float] = {}
+    hk = threading.Thread(target=_housekeeping_loop, args=(stop, lock, deferred, pending), daemon=True)
+    hk.start()
+    log(f"Watching {downloads} for changes.")
+    try:
+        for changes in watch(str(downloads), recursive=True, step=500, stop_event=stop,
+                             rust_timeout=WATCH_DEBOUNCE_SECONDS * 1000, yield_on_timeout=True,
+                             force_polling=force_polling, poll_delay_ms=poll_interval * 1000):
+            now = time.time()
+            with lock:
+                for kind, changed in changes:
+                    # events for files we already finished are our own moves out of Downloads
+                    if con.status_cache.get(changed) in TERMINAL_STATES: continue
+                    if kind == Change.deleted:
+                        forget_file(changed)
+                    else:
+                        note_change(changed)
+                    try:
+                        rel = Path(changed).relative_to(downloads)
+                    except ValueError:
+                        continue
+                    if rel.parts:
+                        pending[rel.parts[0]] = now
+                # debounce: only dispatch entries that have been quiet for a while
+                ready = sorted(n for n, t in pending.items() if now - t >= WATCH_DEBOUNCE_SECONDS)
+                for name in ready:
+                    del pending[name]
+            entries = []
+            for name in ready:
+                if (downloads / name).exists(): entries.append(downloads / name)
+                else: forget_under(downloads / name)
+            if not entries: continue
+            retry = process_batch(con, entries, downloads, output, tmdb_key, flags)
+            with lock:
+                deferred.update(retry)
+    finally:
+        stop.set()
+
 def scan_and_process(downloads: Path, output: Path, poll_interval: int, one_shot: bool=False, tmdb_key: Optional[str]=None):
     ensure_dir(downloads); ensure_dir(output)
+    # watchfiles reports absolute paths: use the same form for the scan, DB keys and events
+    downloads = downloads.resolve(); output = output.resolve()
     con = init_db()
+    # read ARGS once here instead of once per file in the hot loops
+    flags = ScanFlags(posters_only=ARGS.posters_only, confirm=ARGS.confirm,
+                      fetch_posters=not ARGS.no_posters and not ARGS.posters_only, dry_run=ARGS.dry_run)
     log(f"Scanning {downloads} -> {output}")
     try:
-        while True:
-            any_found = False
-            for entry in sorted(downloads.iterdir()):
-                if entry.name.startswith("."): continue
-                # if posters-only mode: only fetch posters and skip transcode logic
-                if ARGS.posters_only:
-                    # for top-level folders only
-                    if entry.is_dir():
-                        any_found = True
-                        if ARGS.confirm and not ask_confirm(f"Fetch poster for {entry.name}?"): continue
-                        fetch_and_save_show_poster(entry.name, output, tmdb_key, downloads_root=downloads, posters_only=True)
-                    continue
-                # skip ignored temp entries
-                if is_temporary_name(entry.name): continue
-                if entry.is_dir():
-                    mapping = collect_videos_two_depth(entry)
-                    if not mapping: continue
-                    any_found = True
-                    # sample a file to check stability
-                    sample = None
-                    for k,v in mapping.items():
-                        if v:
-                            sample = v[0]; break
-                    if sample and not file_is_stable(sample):
-                        log(f"Topdir {entry.name} has unstable files; skipping this pass.")
-                        continue
-                    process_show_topdir(con, entry, downloads, output, tmdb_key)
-                elif entry.is_file():
-                    if entry.suffix.lower() not in VIDEO_EXTS: continue
-                    any_found = True
-                    process_movie_file(con, entry, downloads, output)
-            if one_shot:
-                log("One-shot: exiting.")
-                break
-            if not any_found:
-                log(f"No candidates found. Sleeping {poll_interval}s.")
-            time.sleep(poll_interval)
+        # initial pass picks up everything already present before the watcher starts
+        deferred = scan_once(con, downloads, output, tmdb_key, flags)
+        if one_shot:
+            if deferred:
+                # no watcher to come back later: give still-changing files one stability window
+                log(f"One-shot: waiting {SIZE_STABLE_SECONDS}s for {len(deferred)} entries still being written.")
+                time.sleep(SIZE_STABLE_SECONDS)
+                entries = [downloads / n for n in sorted(deferred) if (downloads / n).exists()]
+                deferred = process_batch(con, entries, downloads, output, tmdb_key, flags)
+            for name in sorted(deferred):
+                log(f"One-shot: left unprocessed (still changing): {name}")
+            log("One-shot: exiting.")
+            return
+        threading.Thread(target=_maintenance_loop, args=(threading.Event(), con), daemon=True).start()
+        watch_and_process(con, downloads, output, poll_interval, tmdb_key, flags, deferred)
     except KeyboardInterrupt:
         log("User interrupt: exiting.")
+    finally:
+        # drop queued probes/posters so exit doesn't wait for every prefetched job
+        PROBE_POOL.shutdown(wait=False, cancel_futures=True)
+        POSTER_POOL.shutdown(wait=False, cancel_futures=True)
+
+# ---------- dry-run ----------
+def install_dry_run():
+    """
+    Specialize for --dry-run once at startup: the side-effecting helpers are
+    swapped for one-line logging stubs, so they carry no per-call dry-run check.
+    ffprobe still runs (read-only) so skip/transcode decisions stay realistic.
+    """
+    global transcode_with_handbrake, move_safe, copy_tree_safe, ask_confirm
+    def dry_transcode(src: Path, dest_tmp: Path, con=None) -> int:
+        log(f"[DRY-RUN] Would transcode {src} -> {dest_tmp}")
+        return 0
+    def dry_move(src: Path, dest_dir: Path) -> Path:
+        dest = unique_dest(dest_dir / src.name)
+        log(f"[DRY-RUN] Would move {src} -> {dest}")
+        return dest
+    def dry_copy_tree(src_dir: Path, dest_dir: Path) -> List[Path]:
+        log(f"[DRY-RUN] Would copy tree {src_dir} -> {dest_dir}")
+        return []
+    def dry_confirm(prompt: str) -> bool:
+        log(f"[DRY-RUN] would ask: {prompt} -> auto-YES")
+        return True
+    transcode_with_handbrake, move_safe, copy_tree_safe, ask_confirm = dry_transcode, dry_move, dry_copy_tree, dry_confirm
 
 # ---------- CLI & entry ----------
 def prompt_paths():
     d = input(f"Downloads folder [{DEFAULT_DOWNLOADS}]: ").strip() or DEFAULT_DOWNLOADS
     o = input(f"Output folder [{DEFAULT_OUTPUT}]: ").strip() or DEFAULT_OUTPUT
-    poll = input(f"Poll interval seconds [{DEFAULT_POLL_INTERVAL}]: ").strip()
+    poll = input(f"Poll interval seconds (network filesystems only) [{DEFAULT_POLL_INTERVAL}]: ").strip()
     try: p = int(poll) if poll else DEFAULT_POLL_INTERVAL
     except: p = DEFAULT_POLL_INTERVAL
     return Path(d).expanduser(), Path(o).expanduser(), p
@@ -415,7 +1064,7 @@ def main():
     p = ArgumentParser(description="Nomad transcoder + posters (multi-depth show support)")
     p.add_argument("--downloads", help="Downloads folder (skip prompt)")
     p.add_argument("--output", help="Output folder (skip prompt)")
-    p.add_argument("--poll", type=int, default=DEFAULT_POLL_INTERVAL, help="Poll interval seconds")
+    p.add_argument("--poll", type=int, default=DEFAULT_POLL_INTERVAL, help="Poll interval seconds (network filesystems only)")
     p.add_argument("--one-shot", action="store_true", help="Scan once and exit")
     p.add_argument("--confirm", action="store_true", help="Ask user to confirm each file before processing (single-fire decisions allowed)")
     p.add_argument("--no-posters", action="store_true", help="Don't fetch posters")
@@ -423,6 +1072,7 @@ def main():
     p.add_argument("--reset-db", action="store_true", help="Reset processed-state DB before starting")
     p.add_argument("--dry-run", action="store_true", help="Show actions but don't modify files or network")
     ARGS = p.parse_args()
+    if ARGS.dry_run: install_dry_run()
 
     if ARGS.reset_db: reset_db()
     if ARGS.downloads: